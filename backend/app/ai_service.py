@@ -1,72 +1,248 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
 from typing import Dict, Any, Optional, List
 from datetime import datetime
 import re
+import re2
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-import json
+import orjson
 
 load_dotenv()
 
+# Emails per AI request, and how many AI requests may be in flight at once
+_AI_BATCH_SIZE = 8
+_AI_MAX_WORKERS = 8
+
+# (connect, read) timeout for AI requests, and retries while the model is
+# loading (503) or we're rate limited (429). Read errors are never retried:
+# a stalled generation should fall back to regex, not be resent
+_AI_TIMEOUT = (3.05, 30)
+_AI_RETRY = Retry(
+    total=3,
+    read=False,
+    backoff_factor=0.5,
+    status_forcelist=[429, 503],
+    allowed_methods=frozenset(['POST']),
+    raise_on_status=False
+)
+
+# Hugging Face Inference API - completely free
+_HF_API_URL = "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.2"
+
+# One session for the whole process, shared by every parser and worker thread,
+# so connections are pooled and reused with one keep-alive slot per worker
+_HF_SESSION = requests.Session()
+_HF_SESSION.headers['Authorization'] = f"Bearer {os.getenv('HUGGINGFACE_API_KEY', '')}"
+_HF_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=1,
+    pool_maxsize=_AI_MAX_WORKERS,
+    max_retries=_AI_RETRY
+))
+
+# Raw AI responses kept in memory, keyed by normalized email content
+_AI_CACHE_SIZE = 4096
+
+# Emails whose body mentions none of these aren't worth an AI request
+_JOB_KEYWORDS = re.compile(
+    r'\b(?:application|applied|applying|interview|offer|reject(?:ed|ion)?|candidate|role|position)s?\b',
+    re.IGNORECASE
+)
+
+# Prompt sent to the AI; filled in per email by build_prompt
+_PROMPT_TEMPLATE = """
+        Analyze this job application email and extract structured information.
+        
+        Email Subject: {subject}
+        Email Sender: {sender}
+        Email Body: {body}
+        
+        Instructions:
+        1. Identify the company name
+        2. Identify the job role/position
+        3. Determine the application status
+        4. Assess your confidence (0.0 to 1.0)
+        5. Explain your reasoning
+        
+        If information is unclear or missing, explain what you need to know.
+        
+        Respond in this JSON format:
+        {{
+            "company": "Company Name or null if unclear",
+            "role": "Job Role or null if unclear", 
+            "date_applied": "YYYY-MM-DD or null if unclear",
+            "source": "email",
+            "status": "applied, interviewing, rejected, or unclear",
+            "confidence": 0.75,
+            "reasoning": "Explain your reasoning and what's unclear"
+        }}
+        """
+
+# Extraction patterns run over whole email bodies, and shapes like
+# '([a-zA-Z\s&]+)\s+application' backtrack quadratically on long runs of words
+# in the stdlib engine, so they are compiled with RE2 (linear-time matching).
+# RE2's \s is ASCII-only; adding \p{Z} keeps Unicode spaces such as the
+# non-breaking spaces common in HTML-derived mail matching as they do in re
+_WS = r'\s\p{Z}'
+
+def _compile_pattern(pattern: str):
+    """Compile a case-insensitive RE2 extraction pattern"""
+    return re2.compile('(?i)' + pattern)
+
+# Common ATS patterns: (company_pattern, role_pattern, confidence)
+_ATS_PATTERNS = {
+    'lever': (
+        _compile_pattern(rf'at[{_WS}]+([a-zA-Z{_WS}&]+)'),
+        _compile_pattern(rf'position[:{_WS}]+([a-zA-Z{_WS}]+)'),
+        0.9
+    ),
+    'greenhouse': (
+        _compile_pattern(rf'([a-zA-Z{_WS}&]+)[{_WS}]+application'),
+        _compile_pattern(rf'([a-zA-Z{_WS}]+)[{_WS}]+position'),
+        0.9
+    ),
+    'workday': (
+        _compile_pattern(rf'([a-zA-Z{_WS}&]+)[{_WS}]+careers'),
+        _compile_pattern(rf'([a-zA-Z{_WS}]+)[{_WS}]+job'),
+        0.85
+    )
+}
+
+# Single-pass ATS detection: one named group per ATS, so the match says which one hit
+_ATS_RE = re.compile(
+    '|'.join(f'(?P<{name}>{re.escape(name)})' for name in _ATS_PATTERNS),
+    re.IGNORECASE
+)
+
+# Simple fallback patterns, tried in order
+_FALLBACK_COMPANY_PATTERNS = tuple(_compile_pattern(p) for p in (
+    rf'at[{_WS}]+([a-zA-Z{_WS}&]+)',
+    rf'([a-zA-Z{_WS}&]+)[{_WS}]+application',
+    rf'([a-zA-Z{_WS}&]+)[{_WS}]+careers'
+))
+
+_FALLBACK_ROLE_PATTERNS = tuple(_compile_pattern(p) for p in (
+    rf'([a-zA-Z{_WS}]+)[{_WS}]+position',
+    rf'([a-zA-Z{_WS}]+)[{_WS}]+role',
+    rf'([a-zA-Z{_WS}]+)[{_WS}]+engineer'
+))
+
+class _ResponseCache:
+    """Thread-safe LRU cache of raw AI responses"""
+    
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+    
+    def put(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+_AI_RESPONSE_CACHE = _ResponseCache(_AI_CACHE_SIZE)
+
+def _cache_key(email_data: Dict[str, Any]) -> str:
+    """Hash the fields the prompt uses, ignoring case and whitespace differences"""
+    text = f"{email_data.get('subject', '')} {email_data.get('sender', '')} {email_data.get('body', '')[:1000]}"
+    normalized = ' '.join(text.lower().split())
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).hexdigest()
+
 class AIJobApplicationParser:
-    def __init__(self):
-        # Hugging Face Inference API - completely free
-        self.api_url = "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.2"
-        self.headers = {"Authorization": f"Bearer {os.getenv('HUGGINGFACE_API_KEY', '')}"}
+    ats_patterns = _ATS_PATTERNS
+    fallback_company_patterns = _FALLBACK_COMPANY_PATTERNS
+    fallback_role_patterns = _FALLBACK_ROLE_PATTERNS
+
+    def __init__(self, min_confidence: float = 0.6):
+        # Regex results at or above this confidence skip the AI entirely
+        self.min_confidence = min_confidence
+        # Number of emails resolved without an AI request (regex hit or cached answer)
+        self.ai_calls_avoided = 0
     
     def parse_job_email(self, email_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Parse a job-related email and extract structured information
         Returns: {company, role, date_applied, source, status, confidence, reasoning}
         """
+        return self.parse_job_emails([email_data])[0]
+    
+    def parse_job_emails(self, emails: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Parse a batch of job-related emails
+        Regex hits are resolved locally; everything else goes to the AI in
+        concurrent batched requests
+        Returns: one parsed result per email, in the same order
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(emails)
+        needs_ai = []
         
         # First try simple regex patterns for common ATS emails
-        structured_result = self._try_structured_parsing(email_data)
-        if structured_result and structured_result['confidence'] > 0.8:
-            return structured_result
+        for i, email_data in enumerate(emails):
+            structured_result = self._try_structured_parsing(email_data)
+            if structured_result and structured_result['confidence'] >= self.min_confidence:
+                results[i] = structured_result
+                self.ai_calls_avoided += 1
+            elif not _JOB_KEYWORDS.search(email_data.get('body', '')):
+                # Empty or clearly unrelated body - nothing for the AI to find
+                results[i] = self._unclear_result('No job-related keywords in email body')
+                self.ai_calls_avoided += 1
+            else:
+                needs_ai.append(i)
+        
+        # Templated emails repeat a lot, so reuse AI answers we've already seen
+        uncached = []
+        for i in needs_ai:
+            ai_response = _AI_RESPONSE_CACHE.get(_cache_key(emails[i]))
+            if ai_response is None:
+                uncached.append(i)
+            else:
+                results[i] = self._build_ai_result(ai_response)
+                self.ai_calls_avoided += 1
         
         # If regex fails, use free AI reasoning
-        return self._ai_reasoning_parse(email_data)
+        if uncached:
+            batches = [
+                [emails[i] for i in uncached[start:start + _AI_BATCH_SIZE]]
+                for start in range(0, len(uncached), _AI_BATCH_SIZE)
+            ]
+            with ThreadPoolExecutor(max_workers=min(_AI_MAX_WORKERS, len(batches))) as executor:
+                ai_results = [parsed_data for batch_results in executor.map(self._ai_reasoning_parse, batches)
+                              for parsed_data in batch_results]
+            for i, parsed_data in zip(uncached, ai_results):
+                results[i] = parsed_data
+        
+        return results
     
     def _try_structured_parsing(self, email_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Try to parse using regex patterns for common ATS systems"""
         
-        subject = email_data.get('subject', '').lower()
-        body = email_data.get('body', '').lower()
+        subject = email_data.get('subject', '')
+        body = email_data.get('body', '')
         sender = email_data.get('sender', '')
         
-        # Common ATS patterns
-        patterns = {
-            'lever': {
-                'company_pattern': r'at\s+([a-zA-Z\s&]+)',
-                'role_pattern': r'position[:\s]+([a-zA-Z\s]+)',
-                'confidence': 0.9
-            },
-            'greenhouse': {
-                'company_pattern': r'([a-zA-Z\s&]+)\s+application',
-                'role_pattern': r'([a-zA-Z\s]+)\s+position',
-                'confidence': 0.9
-            },
-            'workday': {
-                'company_pattern': r'([a-zA-Z\s&]+)\s+careers',
-                'role_pattern': r'([a-zA-Z\s]+)\s+job',
-                'confidence': 0.85
-            }
-        }
-        
         # Try to identify ATS system
-        ats_system = None
-        if 'lever' in sender or 'lever' in body:
-            ats_system = 'lever'
-        elif 'greenhouse' in sender or 'greenhouse' in body:
-            ats_system = 'greenhouse'
-        elif 'workday' in sender or 'workday' in body:
-            ats_system = 'workday'
+        ats_match = _ATS_RE.search(sender) or _ATS_RE.search(body)
+        ats_system = ats_match.lastgroup if ats_match else None
         
         if ats_system:
-            pattern = patterns[ats_system]
-            company_match = re.search(pattern['company_pattern'], subject + ' ' + body)
-            role_match = re.search(pattern['role_pattern'], subject + ' ' + body)
+            company_pattern, role_pattern, confidence = self.ats_patterns[ats_system]
+            text = subject + ' ' + body
+            company_match = company_pattern.search(text)
+            role_match = role_pattern.search(text)
             
             if company_match and role_match:
                 return {
@@ -75,96 +251,98 @@ class AIJobApplicationParser:
                     'date_applied': datetime.now(),
                     'source': 'email',
                     'status': 'applied',
-                    'confidence': pattern['confidence'],
+                    'confidence': confidence,
                     'reasoning': f'Parsed using {ats_system} ATS patterns'
                 }
         
         return None
     
-    def _ai_reasoning_parse(self, email_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Use free AI to reason about unclear emails"""
-        
-        prompt = f"""
-        Analyze this job application email and extract structured information.
-        
-        Email Subject: {email_data.get('subject', '')}
-        Email Sender: {email_data.get('sender', '')}
-        Email Body: {email_data.get('body', '')[:1000]}
-        
-        Instructions:
-        1. Identify the company name
-        2. Identify the job role/position
-        3. Determine the application status
-        4. Assess your confidence (0.0 to 1.0)
-        5. Explain your reasoning
-        
-        If information is unclear or missing, explain what you need to know.
-        
-        Respond in this JSON format:
-        {{
-            "company": "Company Name or null if unclear",
-            "role": "Job Role or null if unclear", 
-            "date_applied": "YYYY-MM-DD or null if unclear",
-            "source": "email",
-            "status": "applied, interviewing, rejected, or unclear",
-            "confidence": 0.75,
-            "reasoning": "Explain your reasoning and what's unclear"
-        }}
-        """
+    def build_prompt(self, email_data: Dict[str, Any]) -> str:
+        """Build the AI prompt for a single email"""
+        return _PROMPT_TEMPLATE.format_map({
+            'subject': email_data.get('subject', ''),
+            'sender': email_data.get('sender', ''),
+            'body': email_data.get('body', '')[:1000]
+        })
+    
+    def _ai_reasoning_parse(self, emails: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Use free AI to reason about unclear emails, one request per batch"""
         
         try:
             payload = {
-                "inputs": prompt,
+                "inputs": [self.build_prompt(email_data) for email_data in emails],
                 "parameters": {
                     "max_new_tokens": 500,
                     "temperature": 0.1,
                     "return_full_text": False
+                },
+                "options": {
+                    "wait_for_model": True,
+                    "use_cache": True
                 }
             }
             
-            response = requests.post(self.api_url, headers=self.headers, json=payload)
+            response = _HF_SESSION.post(_HF_API_URL, json=payload, timeout=_AI_TIMEOUT)
             
             if response.status_code == 200:
-                ai_response = response.json()[0]["generated_text"]
-                parsed_data = self._parse_ai_response(ai_response)
-                parsed_data['reasoning'] = ai_response
-                return parsed_data
+                outputs = orjson.loads(response.content)
+                if len(outputs) != len(emails):
+                    return [self._fallback_parsing(email_data) for email_data in emails]
+                
+                results = []
+                for email_data, output in zip(emails, outputs):
+                    # List inputs may come back as one list of generations per prompt
+                    if isinstance(output, list):
+                        output = output[0]
+                    ai_response = output["generated_text"]
+                    parsed_data = self._load_ai_response(ai_response)
+                    if parsed_data is not None:
+                        # Only reuse answers that parsed - truncated or non-JSON
+                        # output would otherwise stick to every email from the template
+                        _AI_RESPONSE_CACHE.put(_cache_key(email_data), ai_response)
+                    results.append(self._build_ai_result(ai_response, parsed_data))
+                return results
             else:
                 # Fallback to regex if AI fails
-                return self._fallback_parsing(email_data)
+                return [self._fallback_parsing(email_data) for email_data in emails]
                 
         except Exception as e:
-            return self._fallback_parsing(email_data)
+            return [self._fallback_parsing(email_data) for email_data in emails]
+    
+    def _build_ai_result(self, ai_response: str, parsed_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Turn a raw AI response into a parsed result"""
+        if parsed_data is None:
+            parsed_data = self.parse_ai_response(ai_response)
+        parsed_data['reasoning'] = ai_response
+        return parsed_data
+    
+    def _unclear_result(self, reasoning: str) -> Dict[str, Any]:
+        """Result for emails we can't extract anything from"""
+        return {
+            'company': None,
+            'role': None,
+            'date_applied': datetime.now(),
+            'source': 'email',
+            'status': 'unclear',
+            'confidence': 0.0,
+            'reasoning': reasoning
+        }
     
     def _fallback_parsing(self, email_data: Dict[str, Any]) -> Dict[str, Any]:
         """Fallback parsing when AI fails"""
-        subject = email_data.get('subject', '').lower()
-        body = email_data.get('body', '').lower()
-        
-        # Simple fallback patterns
-        company_patterns = [
-            r'at\s+([a-zA-Z\s&]+)',
-            r'([a-zA-Z\s&]+)\s+application',
-            r'([a-zA-Z\s&]+)\s+careers'
-        ]
-        
-        role_patterns = [
-            r'([a-zA-Z\s]+)\s+position',
-            r'([a-zA-Z\s]+)\s+role',
-            r'([a-zA-Z\s]+)\s+engineer'
-        ]
+        text = email_data.get('subject', '') + ' ' + email_data.get('body', '')
         
         company = None
         role = None
         
-        for pattern in company_patterns:
-            match = re.search(pattern, subject + ' ' + body)
+        for pattern in self.fallback_company_patterns:
+            match = pattern.search(text)
             if match:
                 company = match.group(1).strip()
                 break
         
-        for pattern in role_patterns:
-            match = re.search(pattern, subject + ' ' + body)
+        for pattern in self.fallback_role_patterns:
+            match = pattern.search(text)
             if match:
                 role = match.group(1).strip()
                 break
@@ -179,15 +357,34 @@ class AIJobApplicationParser:
             'reasoning': 'Fallback parsing used - limited confidence'
         }
     
-    def _parse_ai_response(self, ai_response: str) -> Dict[str, Any]:
+    def parse_ai_response(self, ai_response: str) -> Dict[str, Any]:
         """Parse the AI's JSON response"""
+        data = self._load_ai_response(ai_response)
+        if data is None:
+            return {
+                'company': None,
+                'role': None,
+                'date_applied': datetime.now(),
+                'source': 'email',
+                'status': 'unclear',
+                'confidence': 0.0
+            }
+        return data
+    
+    def _load_ai_response(self, ai_response: str) -> Optional[Dict[str, Any]]:
+        """Load the JSON object from the AI's response, or None if it isn't usable"""
         try:
-            # Extract JSON from AI response
-            json_start = ai_response.find('{')
-            json_end = ai_response.rfind('}') + 1
-            json_str = ai_response[json_start:json_end]
+            # Most responses are bare JSON; only scan for the braces when they aren't
+            try:
+                data = orjson.loads(ai_response)
+            except orjson.JSONDecodeError:
+                data = None
             
-            data = json.loads(json_str)
+            if not isinstance(data, dict):
+                # Extract JSON from AI response
+                json_start = ai_response.find('{')
+                json_end = ai_response.rfind('}') + 1
+                data = orjson.loads(ai_response[json_start:json_end])
             
             # Ensure all required fields exist
             required_fields = ['company', 'role', 'date_applied', 'source', 'status', 'confidence']
@@ -205,14 +402,7 @@ class AIJobApplicationParser:
             return data
             
         except Exception as e:
-            return {
-                'company': None,
-                'role': None,
-                'date_applied': datetime.now(),
-                'source': 'email',
-                'status': 'unclear',
-                'confidence': 0.0
-            }
+            return None
 
 # Test the AI service
 if __name__ == "__main__":
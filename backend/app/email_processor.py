@@ -4,76 +4,107 @@ from .ai_service import AIJobApplicationParser
 from .models import JobApplication
 from sqlalchemy.orm import Session
 from datetime import datetime
+from itertools import islice
+import threading
+
+# Emails parsed together as they stream in from Gmail
+_PARSE_CHUNK_SIZE = 32
 
 class EmailProcessor:
     def __init__(self):
+        # Minimum confidence to save automatically; the parser uses the same bar
+        # to decide when a regex hit is good enough to skip the AI
+        self.min_confidence = 0.6
         self.gmail_service = GmailService()
-        self.ai_parser = AIJobApplicationParser()
+        self.ai_parser = AIJobApplicationParser(min_confidence=self.min_confidence)
+        # One processor is shared by the app, and the Gmail (httplib2) client
+        # isn't thread-safe, so runs take turns
+        self._lock = threading.Lock()
     
     def process_new_emails(self, db: Session, days_back: int = 7) -> Dict[str, Any]:
         """
         Main function: fetch emails, parse them, and save to database
         Returns: summary of what was processed
         """
-        
-        # Step 1: Fetch job-related emails from Gmail
-        print("Fetching emails from Gmail...")
-        emails = self.gmail_service.search_job_emails(days_back=days_back)
-        print(f"Found {len(emails)} job-related emails")
-        
+        with self._lock:
+            return self._process_new_emails(db, days_back)
+    
+    def _process_new_emails(self, db: Session, days_back: int) -> Dict[str, Any]:
         results = {
-            'total_emails': len(emails),
+            'total_emails': 0,
             'processed': 0,
             'saved': 0,
             'errors': 0,
+            'ai_calls_avoided': 0,
             'details': []
         }
         
-        for email_data in emails:
-            try:
-                # Step 2: Parse email with AI
-                parsed_data = self.ai_parser.parse_job_email(email_data)
-                results['processed'] += 1
+        # Step 1: Fetch job-related emails from Gmail - streamed, so parsing
+        # starts as soon as the first batch arrives
+        print("Fetching emails from Gmail...")
+        emails = self.gmail_service.search_job_emails(days_back=days_back)
+        avoided_before = self.ai_parser.ai_calls_avoided
+        
+        to_save = []
+        while True:
+            chunk = list(islice(emails, _PARSE_CHUNK_SIZE))
+            if not chunk:
+                break
+            results['total_emails'] += len(chunk)
+            
+            # Step 2: Parse emails - regex first, then batched AI requests for the rest
+            parsed_emails = self.ai_parser.parse_job_emails(chunk)
+            
+            for email_data, parsed_data in zip(chunk, parsed_emails):
+                try:
+                    results['processed'] += 1
                 
-                # Step 3: Check if we have enough info to save
-                if self._should_save_application(parsed_data):
-                    # Step 4: Save to database
-                    saved_app = self._save_application(db, parsed_data, email_data)
-                    if saved_app:
-                        results['saved'] += 1
+                    # Step 3: Check if we have enough info to save
+                    if self._should_save_application(parsed_data):
+                        to_save.append((email_data, parsed_data, self._build_application(parsed_data, email_data)))
+                    else:
+                        # Not enough info - flag for manual review
                         results['details'].append({
                             'email_id': email_data['id'],
                             'company': parsed_data.get('company'),
                             'role': parsed_data.get('role'),
                             'confidence': parsed_data.get('confidence'),
-                            'status': 'saved'
-                        })
-                    else:
-                        results['errors'] += 1
-                        results['details'].append({
-                            'email_id': email_data['id'],
-                            'error': 'Failed to save to database',
-                            'status': 'error'
+                            'reasoning': parsed_data.get('reasoning'),
+                            'status': 'needs_review'
                         })
-                else:
-                    # Not enough info - flag for manual review
+                
+                except Exception as e:
+                    results['errors'] += 1
+                    results['details'].append({
+                        'email_id': email_data.get('id', 'unknown'),
+                        'error': str(e),
+                        'status': 'error'
+                    })
+                    print(f"Error processing email: {e}")
+        
+        print(f"Found {results['total_emails']} job-related emails")
+        results['ai_calls_avoided'] = self.ai_parser.ai_calls_avoided - avoided_before
+        
+        # Step 4: Save everything to the database in a single transaction
+        if to_save:
+            saved = self._save_applications(db, [job_app for _, _, job_app in to_save])
+            for email_data, parsed_data, _ in to_save:
+                if saved:
+                    results['saved'] += 1
                     results['details'].append({
                         'email_id': email_data['id'],
                         'company': parsed_data.get('company'),
                         'role': parsed_data.get('role'),
                         'confidence': parsed_data.get('confidence'),
-                        'reasoning': parsed_data.get('reasoning'),
-                        'status': 'needs_review'
+                        'status': 'saved'
+                    })
+                else:
+                    results['errors'] += 1
+                    results['details'].append({
+                        'email_id': email_data['id'],
+                        'error': 'Failed to save to database',
+                        'status': 'error'
                     })
-                
-            except Exception as e:
-                results['errors'] += 1
-                results['details'].append({
-                    'email_id': email_data.get('id', 'unknown'),
-                    'error': str(e),
-                    'status': 'error'
-                })
-                print(f"Error processing email: {e}")
         
         return results
     
@@ -87,37 +118,38 @@ class EmailProcessor:
         
         # Require reasonable confidence
         confidence = parsed_data.get('confidence', 0.0)
-        min_confidence = 0.6
         
-        return has_company and has_role and confidence >= min_confidence
+        return has_company and has_role and confidence >= self.min_confidence
     
-    def _save_application(self, db: Session, parsed_data: Dict[str, Any], email_data: Dict[str, Any]) -> JobApplication:
+    def _build_application(self, parsed_data: Dict[str, Any], email_data: Dict[str, Any]) -> JobApplication:
         """
-        Save parsed application to database
+        Build a job application row from parsed email data
+        """
+        return JobApplication(
+            company=parsed_data.get('company'),
+            role=parsed_data.get('role'),
+            date_applied=parsed_data.get('date_applied') or datetime.now(),
+            source='email',
+            status=parsed_data.get('status', 'applied'),
+            confidence=parsed_data.get('confidence', 0.0),
+            email_snippet=email_data.get('body', '')[:500]  # Store first 500 chars
+        )
+    
+    def _save_applications(self, db: Session, job_apps: List[JobApplication]) -> bool:
+        """
+        Save parsed applications to database with one commit
         """
         try:
-            # Create new job application
-            job_app = JobApplication(
-                company=parsed_data.get('company'),
-                role=parsed_data.get('role'),
-                date_applied=parsed_data.get('date_applied') or datetime.now(),
-                source='email',
-                status=parsed_data.get('status', 'applied'),
-                confidence=parsed_data.get('confidence', 0.0),
-                email_snippet=email_data.get('body', '')[:500]  # Store first 500 chars
-            )
-            
-            db.add(job_app)
+            db.add_all(job_apps)
             db.commit()
-            db.refresh(job_app)
             
-            print(f"Saved application: {job_app.company} - {job_app.role}")
-            return job_app
+            print(f"Saved {len(job_apps)} applications")
+            return True
             
         except Exception as e:
             db.rollback()
-            print(f"Failed to save application: {e}")
-            return None
+            print(f"Failed to save applications: {e}")
+            return False
 
 # Test the email processor
 if __name__ == "__main__":
@@ -133,6 +165,7 @@ if __name__ == "__main__":
         print(f"Processed: {results['processed']}")
         print(f"Saved: {results['saved']}")
         print(f"Errors: {results['errors']}")
+        print(f"AI calls avoided: {results['ai_calls_avoided']}")
         
         print("\nDetails:")
         for detail in results['details']:
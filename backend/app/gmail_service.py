@@ -1,7 +1,7 @@
 import os
 import base64
 import email
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
@@ -10,6 +10,9 @@ from googleapiclient.errors import HttpError
 import json
 from datetime import datetime, timedelta
 
+# Gmail accepts at most 100 calls per batch request
+_MAX_BATCH_SIZE = 100
+
 class GmailService:
     def __init__(self):
         self.SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
@@ -38,8 +41,12 @@ class GmailService:
         self.service = build('gmail', 'v1', credentials=self.creds)
         return self.service
     
-    def search_job_emails(self, days_back: int = 7) -> List[Dict[str, Any]]:
-        """Search for job-related emails in the last N days"""
+    def search_job_emails(self, days_back: int = 7) -> Iterator[Dict[str, Any]]:
+        """
+        Search for job-related emails in the last N days
+        Yields emails batch by batch as they are fetched, so callers can start
+        processing before the whole search has been downloaded
+        """
         if not self.service:
             self.authenticate()
         
@@ -50,25 +57,48 @@ class GmailService:
             results = self.service.users().messages().list(userId='me', q=query).execute()
             messages = results.get('messages', [])
             
-            job_emails = []
-            for message in messages[:10]:  # Limit to 10 for testing
-                msg = self.service.users().messages().get(userId='me', id=message['id']).execute()
-                email_data = self._parse_email(msg)
-                if email_data:
-                    job_emails.append(email_data)
-            
-            return job_emails
+            message_ids = [message['id'] for message in messages[:10]]  # Limit to 10 for testing
+            for start in range(0, len(message_ids), _MAX_BATCH_SIZE):
+                batch_ids = message_ids[start:start + _MAX_BATCH_SIZE]
+                fetched = self._batch_get_messages(batch_ids)
+                
+                for message_id in batch_ids:
+                    if message_id not in fetched:
+                        continue
+                    email_data = self._parse_email(fetched[message_id])
+                    if email_data:
+                        yield email_data
             
         except HttpError as error:
             print(f'An error occurred: {error}')
-            return []
+    
+    def _batch_get_messages(self, message_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch up to _MAX_BATCH_SIZE full messages in one batched HTTP request, keyed by message id"""
+        fetched = {}
+        
+        def collect(request_id, response, exception):
+            if exception is not None:
+                print(f'An error occurred fetching message {request_id}: {exception}')
+            else:
+                fetched[request_id] = response
+        
+        batch = self.service.new_batch_http_request(callback=collect)
+        for message_id in message_ids:
+            batch.add(
+                self.service.users().messages().get(userId='me', id=message_id, format='full'),
+                request_id=message_id
+            )
+        batch.execute()
+        
+        return fetched
     
     def _parse_email(self, message: Dict[str, Any]) -> Dict[str, Any]:
         """Parse email content to extract relevant information"""
         headers = message['payload']['headers']
-        subject = next((h['value'] for h in headers if h['name'] == 'Subject'), '')
-        sender = next((h['value'] for h in headers if h['name'] == 'From'), '')
-        date = next((h['value'] for h in headers if h['name'] == 'Date'), '')
+        header_map = {h['name']: h['value'] for h in headers}
+        subject = header_map.get('Subject', '')
+        sender = header_map.get('From', '')
+        date = header_map.get('Date', '')
         
         # Extract email body
         body = self._get_email_body(message['payload'])
@@ -96,9 +126,10 @@ class GmailService:
 # Test the service
 if __name__ == "__main__":
     gmail = GmailService()
-    emails = gmail.search_job_emails(days_back=7)
-    print(f"Found {len(emails)} job-related emails")
-    for email in emails:
+    count = 0
+    for email in gmail.search_job_emails(days_back=7):
+        count += 1
         print(f"Subject: {email['subject']}")
         print(f"From: {email['sender']}")
-        print("---")
\ No newline at end of file
+        print("---")
+    print(f"Found {count} job-related emails")
\ No newline at end of file
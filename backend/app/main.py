@@ -1,13 +1,18 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from .database import engine
 from . import models
+from .email_processor import EmailProcessor
 from .routes import applications
 
 # Create database tables
 models.Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="Job Application Tracker", version="1.0.0")
+app = FastAPI(title="Job Application Tracker", version="1.0.0", default_response_class=ORJSONResponse)
+
+# Built once and shared by every request to /process-emails/
+app.state.email_processor = EmailProcessor()
 
 # Include the application routes
 app.include_router(applications.router, prefix="/api/v1")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, Text
+from sqlalchemy import Column, Integer, String, DateTime, Float, Text, Index
 from sqlalchemy.sql import func
 from .database import Base
 
@@ -14,4 +14,10 @@ class JobApplication(Base):
     confidence = Column(Float, default=0.0)  # 0.0 to 1.0
     email_snippet = Column(Text)  # Small part of email for reference
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
\ No newline at end of file
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    __table_args__ = (
+        Index("ix_job_status_date", "status", date_applied.desc()),  # Filter by status, newest first
+        Index("ix_job_date_applied", date_applied.desc()),  # Unfiltered list ordering
+        Index("ix_job_company", "company"),
+    )
\ No newline at end of file
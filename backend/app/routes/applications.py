@@ -1,13 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from ..database import get_db
+from ..database import get_db, get_async_db
 from ..models import JobApplication
-from pydantic import BaseModel
+from ..email_processor import EmailProcessor
+from pydantic import BaseModel, ConfigDict
 from datetime import datetime
 
 router = APIRouter()
 
+def get_email_processor(request: Request) -> EmailProcessor:
+    return request.app.state.email_processor
+
 # Pydantic model for API requests/responses
 class JobApplicationCreate(BaseModel):
     company: str
@@ -18,7 +25,7 @@ class JobApplicationCreate(BaseModel):
     confidence: float = 0.0
     email_snippet: str = ""
 
-class JobApplicationResponse(BaseModel):
+class JobApplicationSummary(BaseModel):
     id: int
     company: str
     role: str
@@ -26,44 +33,87 @@ class JobApplicationResponse(BaseModel):
     source: str
     status: str
     confidence: float
-    email_snippet: str
     created_at: datetime
     updated_at: Optional[datetime] = None  # Make this optional
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
+
+class JobApplicationResponse(JobApplicationSummary):
+    email_snippet: str
+
+class JobApplicationSnippet(BaseModel):
+    id: int
+    email_snippet: Optional[str] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+# Columns for the list endpoint - everything except the email_snippet text
+SUMMARY_COLUMNS = (
+    JobApplication.id,
+    JobApplication.company,
+    JobApplication.role,
+    JobApplication.date_applied,
+    JobApplication.source,
+    JobApplication.status,
+    JobApplication.confidence,
+    JobApplication.created_at,
+    JobApplication.updated_at,
+)
 
 @router.post("/applications/", response_model=JobApplicationResponse)
-async def create_application(application: JobApplicationCreate, db: Session = Depends(get_db)):
+async def create_application(application: JobApplicationCreate, db: AsyncSession = Depends(get_async_db)):
     try:
-        db_application = JobApplication(**application.dict())
+        db_application = JobApplication(**application.model_dump())
         db.add(db_application)
-        db.commit()
-        db.refresh(db_application)
+        await db.commit()
+        await db.refresh(db_application)
         return db_application
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/applications/", response_model=List[JobApplicationResponse])
-async def get_applications(db: Session = Depends(get_db)):
-    return db.query(JobApplication).all()
+@router.get("/applications/", response_model=List[JobApplicationSummary])
+async def get_applications(status: Optional[str] = None, limit: int = Query(100, ge=1, le=1000),
+                           offset: int = Query(0, ge=0), db: AsyncSession = Depends(get_async_db)):
+    query = select(*SUMMARY_COLUMNS)
+    if status:
+        query = query.where(JobApplication.status == status)
+    result = await db.execute(
+        query
+        .order_by(JobApplication.date_applied.desc(), JobApplication.id.desc())
+        .limit(limit)
+        .offset(offset)
+    )
+    return [JobApplicationSummary.model_validate(row) for row in result.all()]
 
 @router.get("/applications/{application_id}", response_model=JobApplicationResponse)
-async def get_application(application_id: int, db: Session = Depends(get_db)):
-    application = db.query(JobApplication).filter(JobApplication.id == application_id).first()
+async def get_application(application_id: int, db: AsyncSession = Depends(get_async_db)):
+    application = await db.get(JobApplication, application_id)
     if not application:
         raise HTTPException(status_code=404, detail="Application not found")
     return application
 
+@router.get("/applications/{application_id}/snippet", response_model=JobApplicationSnippet)
+async def get_application_snippet(application_id: int, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(
+        select(JobApplication.id, JobApplication.email_snippet)
+        .where(JobApplication.id == application_id)
+    )
+    row = result.first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Application not found")
+    return JobApplicationSnippet.model_validate(row)
+
 # Add this new endpoint to your existing file
 @router.post("/process-emails/")
-async def process_emails(days_back: int = 7, db: Session = Depends(get_db)):
-    """Process new emails and extract job applications"""
-    from ..email_processor import EmailProcessor
-    
-    processor = EmailProcessor()
-    results = processor.process_new_emails(db, days_back=days_back)
+async def process_emails(days_back: int = 7, db: Session = Depends(get_db),
+                         processor: EmailProcessor = Depends(get_email_processor)):
+    """
+    Process new emails and extract job applications
+    Uses a sync session since the processor runs in a worker thread
+    """
+    # Gmail and AI calls block, so keep them off the event loop
+    results = await run_in_threadpool(processor.process_new_emails, db, days_back=days_back)
     
     return {
         "message": "Email processing completed",
@@ -0,0 +1,134 @@
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import re2
+import requests
+from requests.adapters import HTTPAdapter
+
+from app import ai_service
+from app.ai_service import AIJobApplicationParser
+
+
+class _FakeInference(BaseHTTPRequestHandler):
+    """Stands in for the HF endpoint; behaviour is set per test on the server"""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.hits += 1
+        status, body, delay = self.server.responses[min(self.server.hits, len(self.server.responses)) - 1]
+        time.sleep(delay)
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(body.encode('utf-8'))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_hf(monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _FakeInference)
+    server.hits = 0
+    server.responses = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    # Same adapter config as the real session, mounted for plain http
+    session = requests.Session()
+    session.mount('http://', HTTPAdapter(max_retries=ai_service._AI_RETRY))
+    monkeypatch.setattr(ai_service, '_HF_SESSION', session)
+    monkeypatch.setattr(ai_service, '_HF_API_URL', f'http://127.0.0.1:{server.server_port}/')
+    monkeypatch.setattr(ai_service, '_AI_TIMEOUT', (1, 0.2))
+    # Each test starts with an empty cache so answers always come from the server
+    monkeypatch.setattr(ai_service, '_AI_RESPONSE_CACHE', ai_service._ResponseCache(ai_service._AI_CACHE_SIZE))
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+def test_read_timeout_falls_back_after_one_attempt(fake_hf):
+    fake_hf.responses = [(200, '[]', 1.0)]
+    email = {'subject': 'Read timeout test', 'sender': 'x@example.com',
+             'body': 'Thanks for your application to the Backend Engineer role'}
+
+    result = AIJobApplicationParser().parse_job_email(email)
+
+    assert fake_hf.hits == 1
+    assert result['reasoning'] == 'Fallback parsing used - limited confidence'
+
+
+def test_model_loading_is_retried(fake_hf):
+    ai_text = json.dumps({'company': 'Acme', 'role': 'Engineer', 'date_applied': '2024-01-02',
+                          'source': 'email', 'status': 'applied', 'confidence': 0.8})
+    fake_hf.responses = [
+        (503, '{"error": "Model is loading"}', 0),
+        (200, json.dumps([{'generated_text': ai_text}]), 0),
+    ]
+    email = {'subject': 'Model loading test', 'sender': 'x@example.com',
+             'body': 'Thanks for your application to the Frontend Engineer role'}
+
+    result = AIJobApplicationParser().parse_job_email(email)
+
+    assert fake_hf.hits == 2
+    assert result['company'] == 'Acme'
+    assert result['confidence'] == 0.8
+
+
+def test_unparseable_ai_response_is_not_cached(fake_hf):
+    ai_text = json.dumps({'company': 'Acme', 'role': 'Engineer', 'date_applied': '2024-01-02',
+                          'source': 'email', 'status': 'applied', 'confidence': 0.8})
+    fake_hf.responses = [
+        (200, json.dumps([{'generated_text': '{"company": "Acme", "role": "Eng'}]), 0),
+        (200, json.dumps([{'generated_text': ai_text}]), 0),
+    ]
+    email = {'subject': 'Cache test', 'sender': 'x@example.com',
+             'body': 'Thanks for your application to the Data Engineer role'}
+    parser = AIJobApplicationParser()
+
+    first = parser.parse_job_email(email)
+    second = parser.parse_job_email(email)
+
+    assert first['status'] == 'unclear'
+    assert fake_hf.hits == 2
+    assert second['company'] == 'Acme'
+
+
+def test_ats_patterns_match_non_breaking_spaces():
+    email = {'subject': 'Your\xa0application', 'sender': 'no-reply@lever.co',
+             'body': 'Backend Engineer position at\xa0Acme\xa0Corp'}
+
+    result = AIJobApplicationParser()._try_structured_parsing(email)
+
+    assert result['company'] == 'Acme\xa0Corp'
+
+
+def test_extraction_patterns_agree_with_stdlib_re():
+    stdlib = [
+        (r'at\s+([a-zA-Z\s&]+)', ai_service._ATS_PATTERNS['lever'][0]),
+        (r'([a-zA-Z\s&]+)\s+application', ai_service._ATS_PATTERNS['greenhouse'][0]),
+        (r'([a-zA-Z\s]+)\s+engineer', ai_service._FALLBACK_ROLE_PATTERNS[2]),
+    ]
+    texts = ['Thanks for your Acme & Co application', 'Senior Software ENGINEER at Initech',
+             'We received it at  Globex\n careers', 'nothing here']
+    for pattern, compiled in stdlib:
+        for text in texts:
+            expected = re.search(pattern, text, re.IGNORECASE)
+            actual = compiled.search(text)
+            assert (actual and actual.group(1)) == (expected and expected.group(1))
+
+
+def test_extraction_patterns_use_re2():
+    # RE2 matches in linear time, so long bodies can't trigger backtracking
+    patterns = [p for company, role, _ in ai_service._ATS_PATTERNS.values() for p in (company, role)]
+    patterns += ai_service._FALLBACK_COMPANY_PATTERNS + ai_service._FALLBACK_ROLE_PATTERNS
+    assert all(isinstance(p, re2._Regexp) for p in patterns)
@@ -0,0 +1,20 @@
+import pytest
+
+from app.database import async_database_url
+
+
+@pytest.mark.parametrize("sync_url, async_url", [
+    ("postgresql://u:p@db:5432/jobs", "postgresql+asyncpg://u:p@db:5432/jobs"),
+    ("postgresql+psycopg2://u:p@db/jobs", "postgresql+asyncpg://u:p@db/jobs"),
+    ("postgres://u:p@db/jobs", "postgresql+asyncpg://u:p@db/jobs"),
+    ("postgresql+asyncpg://u:p@db/jobs", "postgresql+asyncpg://u:p@db/jobs"),
+    ("sqlite:////tmp/jobs.db", "sqlite+aiosqlite:////tmp/jobs.db"),
+    ("sqlite+pysqlite:///jobs.db", "sqlite+aiosqlite:///jobs.db"),
+])
+def test_async_database_url_maps_sync_driver(sync_url, async_url):
+    assert async_database_url(sync_url).render_as_string(hide_password=False) == async_url
+
+
+def test_async_database_url_unknown_driver_names_override():
+    with pytest.raises(RuntimeError, match="ASYNC_DATABASE_URL"):
+        async_database_url("mysql+pymysql://u:p@db/jobs")